@@ -17,7 +17,7 @@ import uuid
 import warnings
 from dataclasses import dataclass
 from time import sleep, time
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 
@@ -338,6 +338,26 @@ class BinaryWriter:
 
         return filepath
 
+    def extend(self, indices: Sequence[int], items: Sequence[Any]) -> List[str]:
+        """Store a batch of items, equivalent to calling `add_item` for each `(index, item)` pair.
+
+        Returns the filepaths of the chunks written while adding the items.
+
+        """
+        if len(indices) != len(items):
+            raise ValueError(
+                f"The provided indices and items should have the same length. Found {len(indices)} and {len(items)}."
+            )
+
+        # bind the method once to avoid the attribute lookup for every item
+        add_item = self.add_item
+        filepaths: List[str] = []
+        for index, item in zip(indices, items):
+            filepath = add_item(index, item)
+            if filepath is not None:
+                filepaths.append(filepath)
+        return filepaths
+
     def _should_write(self) -> bool:
         # TODO: Misleading method name, it modifies `self._min_index` and `self._max_index`!
         if not self._serialized_items:
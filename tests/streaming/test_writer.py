@@ -11,29 +11,41 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import io
 import json
 import os
 import random
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import pytest
-import torch
 from lightning_utilities.core.imports import RequirementCache
 from litdata.streaming.compression import _ZSTD_AVAILABLE
 from litdata.streaming.reader import BinaryReader
 from litdata.streaming.sampler import ChunkedIndex
 from litdata.streaming.writer import BinaryWriter
-from litdata.utilities.format import _FORMAT_TO_RATIO
 
 
-def seed_everything(random_seed):
-    random.seed(random_seed)
-    np.random.seed(random_seed)
-    torch.manual_seed(random_seed)
+_PIL_AVAILABLE = RequirementCache("PIL")
 
 
-_PIL_AVAILABLE = RequirementCache("PIL")
+def _count(directory):
+    with os.scandir(directory) as entries:
+        return sum(1 for _ in entries)
+
+
+def _fill(writer, arr):
+    # each index `i` stores `i - 1` so the reader returns the 0-based position of the item
+    writer.extend(arr, [i - 1 for i in arr])
+
+
+def _chunked_indexes(chunks):
+    # iterate chunk by chunk so all the items of a chunk are read before moving to the next one
+    starts = np.cumsum([0] + [chunk["chunk_size"] for chunk in chunks]).tolist()
+    for chunk_index, (start, end) in enumerate(zip(starts[:-1], starts[1:])):
+        for i in range(start, end):
+            yield ChunkedIndex(i, chunk_index=chunk_index)
 
 
 def test_binary_writer_with_ints_and_chunk_bytes(tmpdir):
@@ -48,36 +60,25 @@ def test_binary_writer_with_ints_and_chunk_bytes(tmpdir):
 
     binary_writer = BinaryWriter(tmpdir, chunk_bytes=90)
 
-    for i in range(100):
-        binary_writer[i] = {"i": i, "i+1": i + 1, "i+2": i + 2}
+    binary_writer.extend(range(100), [{"i": i, "i+1": i + 1, "i+2": i + 2} for i in range(100)])
 
-    assert len(os.listdir(tmpdir)) == 49
+    assert _count(tmpdir) == 49
     binary_writer.done()
     binary_writer.merge()
-    assert len(os.listdir(tmpdir)) == 51
+    assert _count(tmpdir) == 51
 
     with open(os.path.join(tmpdir, "index.json")) as f:
         data = json.load(f)
 
-    assert data["chunks"][0]["chunk_size"] == 2
-    assert data["chunks"][1]["chunk_size"] == 2
-    assert data["chunks"][-1]["chunk_size"] == 2
+    assert [chunk["chunk_size"] for chunk in data["chunks"]] == [2] * 50
 
-    chunk_sizes = np.cumsum([chunk["chunk_size"] for chunk in data["chunks"]])
-
-    reader = BinaryReader(tmpdir, max_cache_size=10 ^ 9)
-    for i in range(100):
-        for chunk_index, chunk_start in enumerate(chunk_sizes):
-            if i >= chunk_start:
-                continue
-            break
-        data = reader.read(ChunkedIndex(i, chunk_index=chunk_index))
-        assert data == {"i": i, "i+1": i + 1, "i+2": i + 2}
+    reader = BinaryReader(tmpdir, max_cache_size=10**9)
+    for index in _chunked_indexes(data["chunks"]):
+        i = index.index
+        assert reader.read(index) == {"i": i, "i+1": i + 1, "i+2": i + 2}
 
 
 def test_binary_writer_with_ints_and_chunk_size(tmpdir):
-    seed_everything(42)
-
     match = (
         "The provided compression something_else isn't available"
         if _ZSTD_AVAILABLE
@@ -90,107 +91,97 @@ def test_binary_writer_with_ints_and_chunk_size(tmpdir):
     binary_writer = BinaryWriter(tmpdir, chunk_size=25)
 
     indices = list(range(100))
-    indices = indices[:5] + np.random.permutation(indices[5:]).tolist()
+    tail = indices[5:]
+    random.Random(42).shuffle(tail)
+    indices = indices[:5] + tail
 
-    for i in indices:
-        binary_writer[i] = {"i": i, "i+1": i + 1, "i+2": i + 2}
+    binary_writer.extend(indices, [{"i": i, "i+1": i + 1, "i+2": i + 2} for i in indices])
 
-    assert len(os.listdir(tmpdir)) >= 2
+    assert _count(tmpdir) >= 2
     binary_writer.done()
     binary_writer.merge()
-    assert len(os.listdir(tmpdir)) == 5
+    assert _count(tmpdir) == 5
 
     with open(os.path.join(tmpdir, "index.json")) as f:
         data = json.load(f)
 
-    assert data["chunks"][0]["chunk_size"] == 25
-    assert data["chunks"][1]["chunk_size"] == 25
-    assert data["chunks"][-1]["chunk_size"] == 25
+    assert [chunk["chunk_size"] for chunk in data["chunks"]] == [25] * 4
 
-    reader = BinaryReader(tmpdir, max_cache_size=10 ^ 9)
-    for i in range(100):
-        data = reader.read(ChunkedIndex(i, chunk_index=i // 25))
-        assert data == {"i": i, "i+1": i + 1, "i+2": i + 2}
+    reader = BinaryReader(tmpdir, max_cache_size=10**9)
+    for index in _chunked_indexes(data["chunks"]):
+        i = index.index
+        assert reader.read(index) == {"i": i, "i+1": i + 1, "i+2": i + 2}
 
 
-@pytest.mark.skipif(condition=not _PIL_AVAILABLE or sys.platform == "darwin", reason="Requires: ['pil']")
-def test_binary_writer_with_jpeg_and_int(tmpdir):
-    """Validate the writer and reader can serialize / deserialize a pair of image and label."""
+@pytest.fixture(scope="module")
+def jpeg_corpus(tmp_path_factory):
+    """Generate the JPEG images shared by the writer tests once per module."""
     from PIL import Image
 
-    cache_dir = os.path.join(tmpdir, "chunks")
-    os.makedirs(cache_dir, exist_ok=True)
-    binary_writer = BinaryWriter(cache_dir, chunk_bytes=2 << 12)
+    base = os.fspath(tmp_path_factory.mktemp("imgs"))
+    paths = [f"{base}/img{i}.jpeg" for i in range(100)]
+    imgs_np = np.random.randint(255, size=(100, 28, 28), dtype=np.uint8)
 
-    imgs = []
-
-    for i in range(100):
-        path = os.path.join(tmpdir, f"img{i}.jpeg")
-        np_data = np.random.randint(255, size=(28, 28), dtype=np.uint8)
-        img = Image.fromarray(np_data).convert("L")
-        img.save(path, format="jpeg", quality=100)
-        img = Image.open(path)
-        imgs.append(img)
-        binary_writer[i] = {"x": img, "y": i}
-
-    assert len(os.listdir(cache_dir)) == 24
-    binary_writer.done()
-    binary_writer.merge()
-    assert len(os.listdir(cache_dir)) == 26
+    def _encode(i):
+        # quality=100 barely quantizes the unseeded noise, so every image encodes to nearly the same size and the
+        # `chunk_bytes` layout asserted below ([4] * 25) doesn't depend on the random content
+        Image.fromarray(imgs_np[i]).save(paths[i], format="jpeg", quality=100)
+        return Image.open(paths[i])
 
-    with open(os.path.join(cache_dir, "index.json")) as f:
-        data = json.load(f)
+    # PIL releases the GIL while encoding, so the images can be generated concurrently
+    with ThreadPoolExecutor() as executor:
+        imgs = list(executor.map(_encode, range(100)))
 
-    assert data["chunks"][0]["chunk_size"] == 4
-    assert data["chunks"][1]["chunk_size"] == 4
-    assert data["chunks"][-1]["chunk_size"] == 4
+    imgs_bytes = [np.asarray(img).tobytes() for img in imgs]
 
-    reader = BinaryReader(cache_dir, max_cache_size=10 ^ 9)
-    for i in range(100):
-        data = reader.read(ChunkedIndex(i, chunk_index=i // 4))
-        np.testing.assert_array_equal(np.asarray(data["x"]).squeeze(0), imgs[i])
-        assert data["y"] == i
+    return paths, imgs, imgs_bytes
 
 
 @pytest.mark.skipif(condition=not _PIL_AVAILABLE or sys.platform == "darwin", reason="Requires: ['pil']")
-def test_binary_writer_with_jpeg_filepath_and_int(tmpdir):
-    """Validate the writer and reader can serialize / deserialize a pair of image and label."""
-    from PIL import Image
+@pytest.mark.parametrize(
+    ("mode", "writer_kwargs", "chunk_sizes"),
+    [
+        ("image", {"chunk_bytes": 2 << 12}, [4] * 25),
+        (
+            "filepath",
+            {"chunk_size": 7, "compression": "zstd" if _ZSTD_AVAILABLE else None},
+            [7] * 14 + [2],  # 100 items / 7 items per chunk = 15 chunks
+        ),
+    ],
+)
+def test_binary_writer_with_jpeg_and_int(tmpdir, jpeg_corpus, mode, writer_kwargs, chunk_sizes):
+    """Validate the writer and reader can serialize / deserialize a pair of image (or image filepath) and label."""
+    paths, imgs, imgs_bytes = jpeg_corpus
 
     cache_dir = os.path.join(tmpdir, "chunks")
     os.makedirs(cache_dir, exist_ok=True)
-    binary_writer = BinaryWriter(cache_dir, chunk_size=7)  # each chunk will have 7 items
-
-    imgs = []
+    binary_writer = BinaryWriter(cache_dir, **writer_kwargs)
 
     for i in range(100):
-        path = os.path.join(tmpdir, f"img{i}.jpeg")
-        np_data = np.random.randint(255, size=(28, 28), dtype=np.uint8)
-        img = Image.fromarray(np_data).convert("L")
-        img.save(path, format="jpeg", quality=100)
-        img = Image.open(path)
-        imgs.append(img)
-        binary_writer[i] = {"x": path, "y": i}
-
-    assert len(os.listdir(cache_dir)) == 14  # 100 items / 7 items per chunk = 14 chunks
+        binary_writer[i] = {"x": imgs[i] if mode == "image" else paths[i], "y": i}
+
+    assert _count(cache_dir) == len(chunk_sizes) - 1
     binary_writer.done()
     binary_writer.merge()
-    assert len(os.listdir(cache_dir)) == 16  # 2 items in last chunk and index.json file
+    assert _count(cache_dir) == len(chunk_sizes) + 1  # last chunk and index.json file
 
     with open(os.path.join(cache_dir, "index.json")) as f:
         data = json.load(f)
 
-    assert data["chunks"][0]["chunk_size"] == 7
-    assert data["chunks"][1]["chunk_size"] == 7
-    assert data["chunks"][-1]["chunk_size"] == 2
-    assert sum([chunk["chunk_size"] for chunk in data["chunks"]]) == 100
-
-    reader = BinaryReader(cache_dir, max_cache_size=10 ^ 9)
-    for i in range(100):
-        data = reader.read(ChunkedIndex(i, chunk_index=i // 7))
-        img_read = Image.open(data["x"])
-        print(f"{img_read.size=}")
-        np.testing.assert_array_equal(img_read, imgs[i])
+    assert [chunk["chunk_size"] for chunk in data["chunks"]] == chunk_sizes
+
+    reader = BinaryReader(cache_dir, max_cache_size=10**9)
+    for index in _chunked_indexes(data["chunks"]):
+        i = index.index
+        data = reader.read(index)
+        if mode == "image":
+            img_read = np.asarray(data["x"])
+            assert img_read.shape == (1, 28, 28)
+            assert img_read.dtype == np.uint8
+            assert img_read.squeeze(0).tobytes() == imgs_bytes[i]
+        else:
+            # only the filepath is stored in the chunk, so there is no need to decode the image again
+            assert data["x"] == paths[i]
         assert data["y"] == i
 
 
@@ -203,10 +194,12 @@ def test_binary_writer_with_jpeg_and_png(tmpdir):
     binary_writer = BinaryWriter(cache_dir, chunk_bytes=2 << 12)
 
     np_data = np.random.randint(255, size=(28, 28), dtype=np.uint8)
-    img = Image.fromarray(np_data).convert("L")
-    path = os.path.join(tmpdir, "img.jpeg")
-    img.save(path, format="jpeg", quality=100)
-    img_jpeg = Image.open(path)
+    img = Image.fromarray(np_data)
+    buff = io.BytesIO()
+    img.save(buff, format="jpeg", quality=100)
+    buff.seek(0)
+    img_jpeg = Image.open(buff)
+    img_jpeg.load()
 
     binary_writer[0] = {"x": img_jpeg, "y": 0}
     binary_writer[1] = {"x": img, "y": 1}
@@ -216,10 +209,7 @@ def test_binary_writer_with_jpeg_and_png(tmpdir):
 
 
 def test_writer_human_format(tmpdir):
-    for k, v in _FORMAT_TO_RATIO.items():
-        binary_writer = BinaryWriter(tmpdir, chunk_bytes=f"{1}{k}")
-        assert binary_writer._chunk_bytes == v
-
+    # the parsing of every unit is covered by `test_convert_bytes_to_int`
     binary_writer = BinaryWriter(tmpdir, chunk_bytes="64MB")
     assert binary_writer._chunk_bytes == 64000000
 
@@ -229,11 +219,7 @@ def test_writer_unordered_indexes(tmpdir):
     os.makedirs(cache_dir, exist_ok=True)
 
     binary_writer = BinaryWriter(cache_dir, chunk_size=5)
-
-    arr = [2, 3, 1, 4, 6, 5, 7, 8, 11, 9, 10, 12]
-
-    for i in arr:
-        binary_writer[i] = i - 1
+    _fill(binary_writer, [2, 3, 1, 4, 6, 5, 7, 8, 11, 9, 10, 12])
 
     binary_writer.done()
     binary_writer.merge()
@@ -250,16 +236,29 @@ def test_writer_unordered_indexes(tmpdir):
     assert data["chunks"][2]["chunk_size"] == 2
 
 
+def test_writer_extend(tmpdir):
+    binary_writer = BinaryWriter(tmpdir, chunk_size=5)
+
+    with pytest.raises(ValueError, match="should have the same length"):
+        binary_writer.extend([0, 1, 2], [0, 1])
+
+    # 12 ordered items with 5 items per chunk flush 2 chunks
+    filepaths = binary_writer.extend(range(12), list(range(12)))
+    chunk_files = sorted(f for f in os.listdir(tmpdir) if f.startswith("chunk-") and f.endswith(".bin"))
+    assert len(chunk_files) == 2
+    assert filepaths == [os.path.join(tmpdir, f) for f in chunk_files]
+
+    # a single item doesn't fill a chunk, so nothing is flushed
+    assert binary_writer.extend([12], [12]) == []
+    assert _count(tmpdir) == 2
+
+
 def test_writer_save_checkpoint(tmpdir):
     cache_dir = os.path.join(tmpdir, "chunks")
     os.makedirs(cache_dir, exist_ok=True)
 
     binary_writer = BinaryWriter(cache_dir, chunk_size=5)
-
-    arr = [2, 3, 1, 4, 6, 5, 7, 8, 11, 9, 10, 12]
-
-    for i in arr:
-        binary_writer[i] = i - 1
+    _fill(binary_writer, [2, 3, 1, 4, 6, 5, 7, 8, 11, 9, 10, 12])
 
     binary_writer.done()
     binary_writer.merge()
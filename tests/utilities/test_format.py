@@ -1,4 +1,5 @@
-from litdata.utilities.format import _human_readable_bytes
+import pytest
+from litdata.utilities.format import _FORMAT_TO_RATIO, _convert_bytes_to_int, _human_readable_bytes
 
 
 def test_human_readable_bytes():
@@ -16,3 +17,18 @@ def test_human_readable_bytes():
     assert _human_readable_bytes(int(1e15)) == "1.0 PB"
     assert _human_readable_bytes(int(1e15 + 5e14)) == "1.5 PB"
     assert _human_readable_bytes(int(1e18)) == "1000.0 PB"
+
+
+def test_convert_bytes_to_int():
+    for k, v in _FORMAT_TO_RATIO.items():
+        assert _convert_bytes_to_int(f"1{k}") == v
+        assert _convert_bytes_to_int(f"1{k.upper()}") == v
+
+    assert _convert_bytes_to_int("64MB") == 64000000
+    assert _convert_bytes_to_int(" 1.5 gb ") == 1500000000
+
+    with pytest.raises(ValueError, match="The supported units are"):
+        _convert_bytes_to_int("64")
+
+    with pytest.raises(ValueError, match="Unsupported value/suffix"):
+        _convert_bytes_to_int("abcMB")